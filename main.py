@@ -1,23 +1,52 @@
+import asyncio
 import json
-from openai import OpenAI
-import pdfplumber
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, Timeout
+from pypdf import PdfReader
 import csv
 import re
-import difflib
+import sys
 import unicodedata
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
-from typing import List, Tuple, Dict
+from rapidfuzz import process, fuzz
+from collections import defaultdict
+from typing import List, Tuple, Dict, Optional
 
 
-Produto = Tuple[str, float]
+# (Nome do Produto, Preço em centavos): inteiros evitam erro de arredondamento nas somas
+Produto = Tuple[str, int]
+
+# Padrão: (Nome) — R$(X,XX ou X.XX). O nome não atravessa '|' nem quebras de linha,
+# assim vários produtos na mesma linha são capturados separadamente.
+_PRODUCT_RE = re.compile(r"([^|\n]+?)\s*—\s*R\$\s*(\d+[,.]\d{2})")
+# QUANTIDADE seguida do NOME (ex: '2 paes franceses')
+_QTY_RE = re.compile(r'(\d+)\s+(.+)')
+
+# Tempo máximo (s) para receber a resposta completa do LLM
+LLM_STREAM_TIMEOUT = 60.0
+
+# Nota mínima (0-100, fuzz.ratio) para aceitar uma correspondência. Mesma escala do
+# difflib, mas um pouco mais permissiva: 60 aqui aceita alguns itens que 0.6 recusava.
+FUZZY_SCORE_CUTOFF = 60
+
+# Limite de entradas do cache de correspondências da sessão
+FUZZY_CACHE_MAX = 1024
 
 # -----------------------------
 # Configuração do cliente OpenAI
 # -----------------------------
 load_dotenv()
 try:
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    # Um único pool HTTP persistente: as conexões (e o TLS) ficam abertas entre os turnos.
+    # DefaultAsyncHttpxClient mantém os padrões do SDK (ex: follow_redirects).
+    http_client = DefaultAsyncHttpxClient(
+        # openai.Timeout é o Timeout da mesma biblioteca HTTP que o SDK usa por baixo
+        timeout=Timeout(60.0, connect=10.0),
+        limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+    )
+    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
 except Exception:
     print("ERRO: A variável de ambiente OPENAI_API_KEY não foi carregada corretamente.")
     exit()
@@ -28,13 +57,18 @@ except Exception:
 def load_pdf_text(pdf_path: str) -> str:
     """Extrai texto de todas as páginas de um PDF."""
     try:
-        text = ""
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text.strip()
+        # Acumula as páginas numa lista e junta no final (evita concatenação quadrática)
+        partes: List[str] = []
+        # pypdf extrai só o texto, sem montar os objetos de layout do pdfplumber.
+        # O modo "layout" mantém cada linha do cardápio numa linha só.
+        # Lê todas as páginas: além dos produtos, o texto completo (entrega, horários...)
+        # é o contexto que o ask_llm usa para responder às outras dúvidas do cliente.
+        reader = PdfReader(pdf_path)
+        for page in reader.pages:
+            page_text = page.extract_text(extraction_mode="layout")
+            if page_text:
+                partes.append(page_text)
+        return "\n".join(partes).strip()
     except FileNotFoundError:
         return f"Erro ao ler o PDF: Arquivo '{pdf_path}' não encontrado."
     except Exception as e:
@@ -44,54 +78,95 @@ def load_pdf_text(pdf_path: str) -> str:
 # Função para extrair produtos e preços do texto do PDF
 
 def extract_products(pdf_text: str) -> List[Produto]:
-    """Extrai uma lista de (Nome do Produto, Preço) do texto formatado do PDF."""
+    """Extrai uma lista de (Nome do Produto, Preço em centavos) do texto formatado do PDF."""
     produtos: List[Produto] = []
     # Expressão regular mais robusta: busca qualquer coisa antes de '—' e um preço R$X,XX
-    # Não vamos considerar a primeira linha do PDF no loop se ela for um cabeçalho
-    
-    # Vamos iterar as linhas e usar o REGEX.
     # Ex: Pão Francês — R$0,80 
     # Ex: Bolo Inteiro Chocolate — R$38,00
     
-    # Regex ajustado para capturar o nome e o preço corretamente
-    # Padrão: (Nome) — R$(X,XX ou X.XX)
-    pattern = r"(.+?)\s*—\s*R\$\s*(\d+[,.]\d{2})"
-    
-    for line in pdf_text.splitlines():
-        # A linha pode ter mais de um produto, se eles estiverem na mesma linha separados por um espaço.
-        # Ex: Pão Francês — R$0,80 | Pão de Forma — R$8,50
-        
-        # Vamos dividir a linha usando '|' para tratar múltiplos itens na mesma linha
-        parts = line.split('|')
-        
-        for part in parts:
-            match = re.search(pattern, part.strip())
-            if match:
-                nome = match.group(1).strip()
-                # Substitui vírgula por ponto para conversão em float
-                preco_str = match.group(2).replace(",", ".")
-                try:
-                    preco = float(preco_str)
-                    produtos.append((nome, preco))
-                except ValueError:
-                    # Ignora se a conversão falhar (improvável se o regex funcionar)
-                    pass
-                    
+    # Uma única varredura sobre o texto inteiro: o nome não atravessa '|' nem
+    # quebras de linha, então vários produtos na mesma linha saem separados.
+    # Ex: Pão Francês — R$0,80 | Pão de Forma — R$8,50
+    for match in _PRODUCT_RE.finditer(pdf_text):
+        nome = match.group(1).strip()
+        # O regex garante exatamente duas casas decimais: 'X,XX' -> XXX centavos
+        preco = int(match.group(2).replace(",", "").replace(".", ""))
+        produtos.append((nome, preco))
+
     return produtos
 
+# Cache em disco do cardápio (texto + produtos), invalidado quando o PDF muda
+
+# Versão do formato salvo; mudar aqui invalida caches antigos (v2: preços em centavos)
+_MENU_CACHE_VERSION = 2
+
+def load_cached_menu(pdf_path: str) -> Tuple[str, List[Produto]]:
+    """Retorna (texto do PDF, produtos), reaproveitando o cache salvo ao lado do PDF."""
+    cache_path = f"{pdf_path}.cache.json"
+    try:
+        st = os.stat(pdf_path)
+    except OSError:
+        # Deixa o load_pdf_text produzir a mensagem de erro habitual
+        return load_pdf_text(pdf_path), []
+    key = [_MENU_CACHE_VERSION, st.st_mtime_ns, st.st_size]
+
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("key") == key:
+            return cache["text"], [(nome, preco) for nome, preco in cache["produtos"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass  # Cache ausente ou inválido: refaz a extração
+
+    text = load_pdf_text(pdf_path)
+    if text.startswith("Erro"):
+        return text, []
+    produtos = extract_products(text)
+
+    # Grava em arquivo temporário e renomeia, para nunca deixar um cache pela metade
+    tmp_path = cache_path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "text": text, "produtos": produtos}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # Sem permissão de escrita: segue sem cache
+
+    return text, produtos
+
 # -----------------------------
 # Função para normalizar texto
 # -----------------------------
+_TABELA_ACENTOS = str.maketrans(
+    "áàâãäéèêëíìîïóòôõöúùûüçñÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑ",
+    "aaaaaeeeeiiiiooooouuuucnAAAAAEEEEIIIIOOOOOUUUUCN",
+)
+
+@lru_cache(maxsize=4096)
 def remover_acentos(texto: str) -> str:
     """Remove acentos e caracteres especiais para melhor comparação (fuzzy matching)."""
+    # Texto puramente ASCII não tem acentos: evita o custo do NFD
+    if texto.isascii():
+        return texto
+    # Acentos do português: troca direta via tabela (laço em C, sem NFD)
+    texto = texto.translate(_TABELA_ACENTOS)
+    if texto.isascii():
+        return texto
+    # Sobrou algum caractere fora da tabela: cai no caminho geral do unicodedata
     return ''.join(c for c in unicodedata.normalize('NFD', texto)
                    if unicodedata.category(c) != 'Mn')
 
 # -----------------------------
 # Pergunta ao LLM (resposta amigável)
 # -----------------------------
-def ask_llm(question: str, pdf_text: str = "") -> str:
-    """Envia a pergunta ao LLM com o contexto do PDF."""
+async def ask_llm(
+    question: str, pdf_text: str = "", pronto: Optional[asyncio.Event] = None
+) -> str:
+    """Envia a pergunta ao LLM com o contexto do PDF, exibindo a resposta conforme ela chega.
+
+    Se `pronto` for informado, a requisição é aberta de imediato mas a escrita no
+    terminal só começa quando o evento for sinalizado.
+    """
     context = ""
     if pdf_text:
         context = f"O usuário carregou um cardápio/lista de preços. Aqui está o conteúdo:\n\n{pdf_text}\n\n"
@@ -104,26 +179,62 @@ def ask_llm(question: str, pdf_text: str = "") -> str:
         "Apenas confirme os itens pedidos ou responda a outras dúvidas."
     )
     
+    chunks: List[str] = []
+    stream = None
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": context + question}
-            ]
+        loop = asyncio.get_running_loop()
+        # Limite de tempo total para a resposta: um stream travado não prende o atendimento
+        prazo = loop.time() + LLM_STREAM_TIMEOUT
+        stream = await asyncio.wait_for(
+            client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": context + question}
+                ],
+                stream=True,
+            ),
+            timeout=LLM_STREAM_TIMEOUT,
         )
-        return response.choices[0].message.content
+        if pronto is not None:
+            await pronto.wait()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), timeout=prazo - loop.time())
+            except StopAsyncIteration:
+                break
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            # Mostra cada pedaço assim que chega (tempo até o primeiro token)
+            sys.stdout.write(delta)
+            sys.stdout.flush()
+            chunks.append(delta)
+        return "".join(chunks)
     except Exception as e:
-        return f"Desculpe, houve um erro ao comunicar com a IA: {e}"
-
-
-# Função para calcular pedidos (fuzzy matching e quantidades)
-
-def calcular_pedido_completo(pedido: str, produtos: List[Produto]) -> Tuple[float, List[str]]:
-    """Calcula o total de um pedido usando fuzzy matching com a lista de produtos."""
-    total = 0.0
-    itens_pedidos: List[str] = []
-    
+        if isinstance(e, asyncio.TimeoutError):
+            motivo = f"tempo limite de {LLM_STREAM_TIMEOUT:.0f}s excedido"
+        else:
+            motivo = str(e)
+        if pronto is not None:
+            await pronto.wait()
+        erro = f"Desculpe, houve um erro ao comunicar com a IA: {motivo}"
+        # Separa a mensagem de erro de uma resposta que tenha saído pela metade
+        if chunks:
+            erro = "\n" + erro
+        sys.stdout.write(erro)
+        sys.stdout.flush()
+        return "".join(chunks) + erro
+    finally:
+        # Devolve a conexão ao pool mesmo se o stream travar ou falhar no meio
+        if stream is not None:
+            await stream.close()
+
+
+# Tabelas normalizadas do cardápio (calculadas uma vez na inicialização)
+
+def preparar_tabelas(produtos: List[Produto]) -> Tuple[List[str], Dict[str, Produto]]:
+    """Normaliza os nomes dos produtos uma única vez para reutilizar em todos os pedidos."""
     # Cria uma lista de nomes de produtos normalizados para a comparação
     nomes_prod_norm: List[str] = [remover_acentos(p[0].lower()) for p in produtos]
     
@@ -131,116 +242,312 @@ def calcular_pedido_completo(pedido: str, produtos: List[Produto]) -> Tuple[floa
     mapa_produtos: Dict[str, Produto] = {
         remover_acentos(p[0].lower()): p for p in produtos
     }
+    return nomes_prod_norm, mapa_produtos
+
+
+@lru_cache(maxsize=8)
+def _preparar_tabelas_cache(produtos: Tuple[Produto, ...]) -> Tuple[List[str], Dict[str, Produto]]:
+    """Versão memoizada de preparar_tabelas para quem não passa as tabelas prontas."""
+    return preparar_tabelas(list(produtos))
+
+
+def indexar_palavras(nomes_prod_norm: List[str]) -> Dict[str, List[int]]:
+    """Cria um índice invertido (palavra -> índices dos produtos que a contêm)."""
+    indice: Dict[str, List[int]] = defaultdict(list)
+    for i, nome in enumerate(nomes_prod_norm):
+        for palavra in set(nome.split()):
+            indice[palavra].append(i)
+    return dict(indice)
+
+
+# Busca o produto correspondente a um item do pedido
+
+def _singulares(texto: str) -> List[str]:
+    """Possíveis singulares de um texto já sem acentos (ex: 'paes' -> 'pao', 'coxinhas' -> 'coxinha')."""
+    formas: List[str] = []
+    # -ães / -ões -> -ão
+    if texto.endswith(('aes', 'oes')):
+        formas.append(texto[:-3] + 'ao')
+    if texto.endswith('s'):
+        formas.append(texto[:-1])
+    return formas
+
+
+def _busca_exata(prod_nome_raw: str, mapa_produtos: Dict[str, Produto]) -> Optional[Produto]:
+    """Nome exato (ou no plural, ex: 'coxinhas', 'paes'), sem precisar de fuzzy."""
+    direto = mapa_produtos.get(prod_nome_raw)
+    if direto is None:
+        for forma in _singulares(prod_nome_raw):
+            direto = mapa_produtos.get(forma)
+            if direto is not None:
+                break
+    return direto
+
+
+def _guardar_no_cache(
+    cache: Optional[Dict[str, Optional[Produto]]],
+    prod_nome_raw: str,
+    produto: Optional[Produto],
+):
+    """Registra o resultado do fuzzy no cache da sessão, respeitando FUZZY_CACHE_MAX."""
+    if cache is None:
+        return
+    if len(cache) >= FUZZY_CACHE_MAX:
+        # LRU: cada acerto move a entrada para o fim do dict (ver calcular_pedido_completo),
+        # então a primeira é a usada há mais tempo
+        del cache[next(iter(cache))]
+    cache[prod_nome_raw] = produto
+
+
+def _melhor_sem_empate(pares: List[Tuple[float, int]]) -> Optional[int]:
+    """Índice do melhor par (nota, índice) acima do corte; None se não houver ou se houver empate no topo."""
+    pares = sorted(pares, reverse=True)[:2]
+    if not pares or pares[0][0] < FUZZY_SCORE_CUTOFF:
+        return None
+    # Dois produtos com a mesma nota (ex: 'torta' -> Frango ou Limão): melhor avisar do que chutar
+    if len(pares) > 1 and pares[1][0] == pares[0][0]:
+        return None
+    return pares[0][1]
+
+
+def _candidatos(nome: str, indice_palavras: Optional[Dict[str, List[int]]]) -> List[int]:
+    """Produtos que compartilham alguma palavra (ou seu singular) com o item."""
+    candidatos = set()
+    if indice_palavras:
+        for palavra in nome.split():
+            candidatos.update(indice_palavras.get(palavra, ()))
+            for forma in _singulares(palavra):
+                candidatos.update(indice_palavras.get(forma, ()))
+    return sorted(candidatos)
+
+
+def casar_em_lote(
+    nomes: List[str],
+    produtos: List[Produto],
+    nomes_prod_norm: List[str],
+    indice_palavras: Optional[Dict[str, List[int]]] = None,
+) -> List[Optional[Produto]]:
+    """Faz o fuzzy matching de vários itens, comparando só com os candidatos do índice quando houver."""
+    if not nomes_prod_norm:
+        return [None] * len(nomes)
+
+    # fuzz.ratio usa a mesma escala do difflib, mas calcula a distância indel (LCS)
+    # exata em vez dos blocos gulosos do SequenceMatcher, então a nota nunca é menor.
+    # O WRatio aceitaria pedaços soltos ('2 pães' -> Pastel Assado), e aqui um palpite
+    # errado vira cobrança errada.
+    # processor=None: os nomes e o pedido já estão normalizados.
+    resultado: List[Optional[int]] = [None] * len(nomes)
+
+    # 1º: cada item contra os produtos que compartilham alguma palavra com ele
+    sem_candidatos: List[int] = []
+    for pos, nome in enumerate(nomes):
+        colunas = _candidatos(nome, indice_palavras)
+        if colunas:
+            pares = process.extract(
+                nome, {j: nomes_prod_norm[j] for j in colunas},
+                scorer=fuzz.ratio, processor=None, limit=2, score_cutoff=FUZZY_SCORE_CUTOFF,
+            )
+            resultado[pos] = _melhor_sem_empate([(score, j) for _, score, j in pares])
+        if resultado[pos] is None:
+            sem_candidatos.append(pos)
+
+    # 2º: o que sobrou (sem candidatos ou nenhum bom o suficiente) contra o cardápio inteiro
+    if len(sem_candidatos) == 1:
+        pos = sem_candidatos[0]
+        pares = process.extract(
+            nomes[pos], nomes_prod_norm,
+            scorer=fuzz.ratio, processor=None, limit=2, score_cutoff=FUZZY_SCORE_CUTOFF,
+        )
+        resultado[pos] = _melhor_sem_empate([(score, j) for _, score, j in pares])
+    elif sem_candidatos:
+        # Uma chamada nativa para a matriz itens x produtos. workers=1: com um cardápio
+        # deste tamanho, abrir threads custa mais do que a conta em si.
+        scores = process.cdist(
+            [nomes[pos] for pos in sem_candidatos], nomes_prod_norm,
+            scorer=fuzz.ratio, processor=None, score_cutoff=FUZZY_SCORE_CUTOFF, workers=1,
+        )
+        for pos, linha in zip(sem_candidatos, scores):
+            topo = linha.argsort()[::-1][:2]
+            resultado[pos] = _melhor_sem_empate([(float(linha[j]), int(j)) for j in topo])
+
+    return [produtos[j] if j is not None else None for j in resultado]
+
+
+# Função para calcular pedidos (fuzzy matching e quantidades)
+
+def calcular_pedido_completo(
+    pedido: str,
+    produtos: List[Produto],
+    nomes_prod_norm: Optional[List[str]] = None,
+    mapa_produtos: Optional[Dict[str, Produto]] = None,
+    cache: Optional[Dict[str, Optional[Produto]]] = None,
+    indice_palavras: Optional[Dict[str, List[int]]] = None,
+) -> Tuple[int, List[str]]:
+    """Calcula o total (em centavos) de um pedido usando fuzzy matching com a lista de produtos."""
+    if nomes_prod_norm is None or mapa_produtos is None:
+        # Sem tabelas prontas: normaliza o cardápio uma vez e reaproveita nas próximas chamadas
+        nomes_prod_norm, mapa_produtos = _preparar_tabelas_cache(tuple(produtos))
+
+    total = 0
+    itens_pedidos: List[str] = []
 
     # Divide o pedido em itens individuais (ex: '2 pães, 1 café e 3 sonhos')
-    palavras = re.split(r',| e ', remover_acentos(pedido.lower()))
-    palavras = [p.strip() for p in palavras if p.strip()]
+    # Normaliza o pedido uma vez e tokeniza numa única passada; os tokens já
+    # chegam prontos ao fuzzy (processor=None), sem nova normalização por item.
+    # Separadores: ',' e ' e ' (espaços colapsados antes). replace/split rodam em C,
+    # sem passar pelo motor de regex.
+    pedido_norm = " ".join(remover_acentos(pedido.lower()).split())
+    tokens = tuple(t for p in pedido_norm.replace(" e ", ",").split(",") if (t := p.strip()))
 
     # Regex para identificar QUANTIDADE e NOME em qualquer ordem, com ou sem a palavra 'de'
     # Ex: '2 paes franceses', 'paes franceses 2', '2 de paes'
     # Padrão: (\d+)?\s*(.*?)(\s+\d+)?
     # Tenta encontrar um número no início ou no fim da string
     
-    for palavra in palavras:
-        qtd_match = re.match(r'(\d+)\s+(.+)', palavra)
+    # 1ª passada: separa quantidade e nome; resolve nomes exatos e os já vistos na sessão
+    itens: List[Tuple[int, str]] = []
+    resolvidos: Dict[str, Optional[Produto]] = {}
+    pendentes: List[str] = []
+    for token in tokens:
+        qtd_match = _QTY_RE.match(token)
         
         if qtd_match:
             qtd = int(qtd_match.group(1))
             prod_nome_raw = qtd_match.group(2).strip()
         else:
             qtd = 1
-            prod_nome_raw = palavra
+            prod_nome_raw = token
+        itens.append((qtd, prod_nome_raw))
+
+        if prod_nome_raw in resolvidos or prod_nome_raw in pendentes:
+            continue
+        direto = _busca_exata(prod_nome_raw, mapa_produtos)
+        if direto is not None:
+            resolvidos[prod_nome_raw] = direto
+        elif cache is not None and prod_nome_raw in cache:
+            # Reinsere no fim para marcar a entrada como usada recentemente (LRU)
+            resolvidos[prod_nome_raw] = cache[prod_nome_raw] = cache.pop(prod_nome_raw)
+        else:
+            pendentes.append(prod_nome_raw)
+
+    # 2ª passada: fuzzy matching de todos os itens restantes numa única chamada
+    if pendentes:
+        encontrados = casar_em_lote(pendentes, produtos, nomes_prod_norm, indice_palavras)
+        for prod_nome_raw, produto in zip(pendentes, encontrados):
+            resolvidos[prod_nome_raw] = produto
+            _guardar_no_cache(cache, prod_nome_raw, produto)
 
-        # Pega a melhor correspondência (fuzzy matching)
-        match = difflib.get_close_matches(prod_nome_raw, nomes_prod_norm, n=1, cutoff=0.6)
+    for qtd, prod_nome_raw in itens:
+        produto = resolvidos[prod_nome_raw]
 
-        if match:
-            nome_norm_match = match[0]
-            nome_original, preco = mapa_produtos[nome_norm_match]
+        if produto is not None:
+            nome_original, preco = produto
             
             subtotal = preco * qtd
             total += subtotal
             # Salva o item usando o nome original para o output
-            itens_pedidos.append(f"{qtd} {nome_original} — R${subtotal:.2f}")
+            itens_pedidos.append(f"{qtd} {nome_original} — R${subtotal / 100:.2f}")
         else:
             # Melhoria: feedback sobre itens não encontrados
             print(f" Aviso: Não encontramos '{prod_nome_raw}' no cardápio.")
 
 
-    return round(total, 2), itens_pedidos
+    return total, itens_pedidos
 
 
 # Função para formatar e exibir o cardápio
 
 def display_cardapio(produtos: List[Produto]):
     """Formata e exibe os produtos disponíveis para o usuário."""
-    print("""
+    # Monta o cardápio inteiro e escreve de uma vez só (uma escrita em vez de uma por produto)
+    linhas = ["""
 -----------------------------------------------------------------------
           Padaria Barreto Doces – Lista de Preços e Atendimento 
------------------------------------------------------------------------""")
+-----------------------------------------------------------------------"""]
     for nome, preco in produtos:
-        
-        preco_str = f"R${preco:,.2f}".replace('.', '#').replace(',', '.').replace('#', ',')
-        print(f"• {nome:.<30} {preco_str}") # Alinha o nome com pontos
+        # Preço no formato brasileiro (vírgula decimal)
+        preco_str = f"R${preco / 100:.2f}".replace('.', ',')
+        linhas.append(f"• {nome:.<30} {preco_str}") # Alinha o nome com pontos
     
-    print("-" * 55)
+    linhas.append("-" * 55)
+    sys.stdout.write("\n".join(linhas) + "\n")
 
 
-def main():
+async def main():
     print(" Assistente LLM - Atendimento Padaria \n")
 
     pdf_path = "ListaPrecosLLM.pdf"
-    pdf_text = load_pdf_text(pdf_path)
+    # CORREÇÃO/MELHORIA: Extrai a lista real de produtos do PDF (ou do cache em disco).
+    pdf_text, produtos_cardapio = load_cached_menu(pdf_path)
 
     if pdf_text.startswith("Erro"):
         print(pdf_text)
         return
-
-    # CORREÇÃO/MELHORIA: Extrai a lista real de produtos do PDF.
-    produtos_cardapio = extract_products(pdf_text)
     
     if not produtos_cardapio:
         print("ERRO: Não foi possível extrair nenhum produto do PDF. Verifique o formato do arquivo.")
         return
 
+    # Normaliza os nomes do cardápio uma única vez, fora do loop de atendimento
+    nomes_prod_norm, mapa_produtos = preparar_tabelas(produtos_cardapio)
+    indice_palavras = indexar_palavras(nomes_prod_norm)
+    # Cache da sessão: item normalizado -> produto encontrado (ou None)
+    cache_fuzzy: Dict[str, Optional[Produto]] = {}
+
     # CORREÇÃO: Exibe a lista real de produtos.
     display_cardapio(produtos_cardapio)
 
     cliente = input("Por favor, digite seu nome: ").strip()
     print(f"\nOlá, **{cliente}**! Bem-vindo(a) à Padaria.\n")
 
-    total_final = 0.0
+    # Acumulado em centavos; só vira reais na hora de exibir/gravar
+    total_final = 0
     todos_itens = []
 
-    while True:
-        # Permite que o cliente peça vários itens de uma vez
-        pedido_text = input("Insira os itens que deseja (ex: 2 pães franceses e 1 café com leite): ").strip()
+    # Fecha o pool HTTP do cliente OpenAI ao sair do atendimento, mesmo em caso de erro
+    try:
+        while True:
+            # Permite que o cliente peça vários itens de uma vez
+            pedido_text = input("Insira os itens que deseja (ex: 2 pães franceses e 1 café com leite): ").strip()
 
-        if pedido_text.lower() in ["sair", "finalizar", "x"]:
-            break
+            if pedido_text.lower() in ["sair", "finalizar", "x"]:
+                break
         
-        if not pedido_text:
-            continue
-
-        # 1 — Resposta amigável do LLM (apenas confirmação/conversa)
-        resposta = ask_llm(pedido_text, pdf_text)
-        print("\n**Assistente:**", resposta, "\n")
-
-        # 2 — Cálculo REAL do pedido
-        total, itens = calcular_pedido_completo(pedido_text, produtos_cardapio)
-
-        if total > 0:
-            total_final += total
-            todos_itens.extend(itens)
-            print(f" Itens adicionados. Subtotal atual: **R${total_final:.2f}**")
+            if not pedido_text:
+                continue
+
+            # 1 — Resposta amigável do LLM (apenas confirmação/conversa), disparada
+            # em segundo plano para não esperar a rede antes de calcular o pedido.
+            # Ela só começa a aparecer na tela depois dos avisos do cálculo.
+            pronto = asyncio.Event()
+            tarefa_llm = asyncio.create_task(ask_llm(pedido_text, pdf_text, pronto))
+
+            # 2 — Cálculo REAL do pedido (local), em paralelo com a chamada ao LLM
+            total, itens = await asyncio.to_thread(
+                calcular_pedido_completo,
+                pedido_text, produtos_cardapio, nomes_prod_norm, mapa_produtos,
+                cache_fuzzy, indice_palavras,
+            )
+
+            print("\n**Assistente:**", end=" ", flush=True)
+            pronto.set()
+            await tarefa_llm  # a resposta é exibida em streaming pelo próprio ask_llm
+            print(" \n")
+
+            if total > 0:
+                total_final += total
+                todos_itens.extend(itens)
+                print(f" Itens adicionados. Subtotal atual: **R${total_final / 100:.2f}**")
         
-        print("-" * 55)
+            print("-" * 55)
 
 
-        # 3 — Pergunta se quer continuar
-        continuar = input("Deseja pedir mais algum item? (s/n): ").strip().lower()
-        if continuar not in ["s", "sim"]:
-            break
+            # 3 — Pergunta se quer continuar
+            continuar = input("Deseja pedir mais algum item? (s/n): ").strip().lower()
+            if continuar not in ["s", "sim"]:
+                break
+    finally:
+        await client.close()
 
     # FINALIZAÇÃO DO PEDIDO
     print("\n" + "="*50)
@@ -252,7 +559,7 @@ def main():
             print(f"- {item}")
 
         print("\n" + "="*50)
-        print(f"**TOTAL A PAGAR: R${total_final:,.2f}**")
+        print(f"**TOTAL A PAGAR: R${total_final / 100:,.2f}**")
         print("="*50)
         
         
@@ -260,19 +567,21 @@ def main():
         # Garante que o arquivo CSV tenha o cabeçalho se for a primeira vez
         file_exists = os.path.isfile(csv_file) and os.path.getsize(csv_file) > 0
 
-        with open(csv_file, mode="a", newline="", encoding="utf-8") as file:
+        # Monta todas as linhas antes e grava num único bloco (buffer de 64 KiB)
+        linhas = []
+        if not file_exists:
+            linhas.append(["Cliente", "Itens", "Total"])
+        # Formata a lista de itens para o CSV
+        itens_str = " | ".join(todos_itens)
+        linhas.append([cliente, itens_str, f"R${total_final / 100:,.2f}"])
+
+        with open(csv_file, mode="a", newline="", encoding="utf-8", buffering=1 << 16) as file:
             writer = csv.writer(file, delimiter=';') # Use ; como delimitador para evitar problemas com vírgulas no preço
-            
-            if not file_exists:
-                writer.writerow(["Cliente", "Itens", "Total"])
-                
-            # Formata a lista de itens para o CSV
-            itens_str = " | ".join(todos_itens)
-            writer.writerow([cliente, itens_str, f"R${total_final:,.2f}"])
+            writer.writerows(linhas)
 
         print(f"\n Pedido salvo em '{csv_file}'. Obrigado pela preferência!\n")
     else:
         print("Nenhum item foi pedido. Volte sempre!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file